@@ -4,10 +4,16 @@ This module provides a chat interface using Streamlit's native components.
 """
 
 import streamlit as st
-import json
 import logging
-import tiktoken
-from utils import get_assistant_details, create_thread, send_message
+import sqlite3
+from utils import get_assistant_details, create_thread, send_message, save_messages
+from chat_ui import (
+    initialize_session_state,
+    display_chat_controls,
+    display_chat_interface,
+    display_new_messages,
+    handle_assistant_error,
+)
 
 # Configure logging
 logging.basicConfig(
@@ -17,111 +23,6 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def initialize_session_state() -> None:
-    """
-    Initialize Streamlit session state variables.
-    Creates new thread and empty message list if they don't exist.
-    """
-    if "thread_id" not in st.session_state:
-        st.session_state.thread_id = create_thread()
-    if "messages" not in st.session_state:
-        st.session_state.messages = []
-    if "selected_assistant" not in st.session_state:
-        st.session_state.selected_assistant = "ASSISTANT_ID"  # Default assistant
-
-def get_token_count(messages: list) -> int:
-    """
-    Calculate total tokens used in conversation.
-    Args:
-        messages (list): List of conversation messages
-    Returns:
-        int: Total token count
-    """
-    enc = tiktoken.get_encoding("cl100k_base")
-    text = " ".join([msg["content"] for msg in messages])
-    return len(enc.encode(text))
-
-def display_chat_controls() -> None:
-    """Display chat control options: save, clear, and token count."""
-    cols = st.columns([1, 1, 2])  # Simplified column layout
-    
-    with cols[0]:
-        # Save chat button
-        json_messages = json.dumps(st.session_state.messages).encode("utf-8")
-        st.download_button(
-            label="💾 Save Chat",
-            data=json_messages,
-            file_name="chat_history.json",
-            mime="application/json",
-        )
-    
-    with cols[1]:
-        # Clear chat button
-        if st.button("🗑️ Clear Chat"):
-            st.session_state.messages = []
-            st.session_state.thread_id = create_thread()
-            st.rerun()
-    
-    with cols[2]:
-        # Token counter
-        token_count = get_token_count(st.session_state.messages)
-        st.link_button(
-            f"🔤 {token_count} tokens", 
-            "https://platform.openai.com/tokenizer"
-        )
-
-def display_chat_interface() -> None:
-    """Display the main chat interface with message history."""
-    # Chat container with scrolling
-    chat_container = st.container()
-    with chat_container:
-        st.markdown("""
-            <style>
-                .stChatContainer {
-                    height: 450px;
-                    overflow-y: auto;
-                    padding: 1rem;
-                    background-color: #f8f9fa;
-                    border-radius: 0.5rem;
-                }
-            </style>
-        """, unsafe_allow_html=True)
-        
-        # Display message history
-        for message in st.session_state.messages:
-            with st.chat_message(
-                message["role"],
-                avatar="🤖" if message["role"] == "assistant" else "👤"
-            ):
-                st.write(message["content"])
-
-def handle_assistant_error(thread_id, user_message):
-    """
-    Handle errors when communicating with the assistant.
-    Provides fallback behavior when the assistant fails to respond.
-    
-    Args:
-        thread_id (str): The current thread ID
-        user_message (str): The user's message that caused the error
-        
-    Returns:
-        list: Updated messages list with error notification
-    """
-    # Log the error
-    logger.error(f"Assistant failed to process message: {user_message}")
-    
-    # Add user message to the conversation
-    st.session_state.messages.append({"role": "user", "content": user_message})
-    
-    # Add error message from assistant
-    error_message = {
-        "role": "assistant", 
-        "content": "I'm sorry, I encountered an error while processing your request. This might happen when retrieving information from my knowledge base. Could you try rephrasing your question or asking something else?"
-    }
-    st.session_state.messages.append(error_message)
-    
-    return st.session_state.messages
-
 def main():
     """Main application function."""
     # Page configuration
@@ -175,33 +76,53 @@ def main():
         # Processing spinner container - placed between input and chat
         spinner_container = st.empty()
         
-        if st.session_state.messages:
-            display_chat_controls()
+        # Controls are filled in after any new messages are added, so the
+        # download payload and token count include the latest exchange
+        controls_slot = st.empty()
         
         display_chat_interface()
+
+        # New messages are written here instead of rerunning the whole script
+        chat_placeholder = st.container()
         
+        if user_message and not st.session_state.thread_id:
+            # Create the thread lazily on the first message
+            st.session_state.thread_id = create_thread()
+            if st.session_state.thread_id:
+                st.query_params["tid"] = st.session_state.thread_id
+
         if user_message and st.session_state.thread_id:
             # Show spinner in the designated container
             with spinner_container.container():
                 st.spinner("Processing...")
                 
             try:
-                messages = send_message(st.session_state.thread_id, user_message)
-                if messages:
-                    st.session_state.messages = messages
-                    st.rerun()
+                new_messages = send_message(st.session_state.thread_id, user_message)
+                if new_messages:
+                    st.session_state.messages.extend(new_messages)
+                    st.session_state.messages_version += 1
+                    try:
+                        save_messages(st.session_state.thread_id, new_messages)
+                    except sqlite3.Error as e:
+                        logger.exception(f"Error saving chat history: {str(e)}")
                 else:
                     # Handle case where send_message returns None or empty
                     st.session_state.messages = handle_assistant_error(
                         st.session_state.thread_id, user_message
                     )
-                    st.rerun()
+                    new_messages = st.session_state.messages[-2:]
             except Exception as e:
                 logger.exception(f"Error processing message: {str(e)}")
                 st.session_state.messages = handle_assistant_error(
                     st.session_state.thread_id, user_message
                 )
-                st.rerun()
+                new_messages = st.session_state.messages[-2:]
+
+            display_new_messages(chat_placeholder, new_messages)
+
+        if st.session_state.messages:
+            with controls_slot.container():
+                display_chat_controls()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
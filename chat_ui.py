@@ -0,0 +1,174 @@
+"""
+Chat UI components for the Streamlit assistant app.
+Session state setup, token counting, chat controls and history rendering.
+"""
+
+import streamlit as st
+import orjson
+import logging
+import sqlite3
+import tiktoken
+from utils import load_messages
+
+logger = logging.getLogger(__name__)
+
+# Avatar shown next to each message role
+_AVATARS = {"user": "👤", "assistant": "🤖"}
+
+def initialize_session_state() -> None:
+    """
+    Initialize Streamlit session state variables.
+    Reattaches to the thread in the "tid" query param if present, restoring
+    its stored history. Otherwise no thread is created until the first
+    message is sent.
+    Creates an empty message list if it doesn't exist.
+    """
+    if "thread_id" not in st.session_state:
+        tid = st.query_params.get("tid")
+        st.session_state.thread_id = tid
+        if tid:
+            try:
+                st.session_state.messages = load_messages(tid)
+            except sqlite3.Error as e:
+                logger.exception(f"Error loading chat history: {str(e)}")
+    st.session_state.setdefault("messages", [])
+    st.session_state.setdefault("messages_version", 0)
+    st.session_state.setdefault("token_count", 0)
+    st.session_state.setdefault("tokens_counted_upto", 0)
+    st.session_state.setdefault("selected_assistant", "ASSISTANT_ID")  # Default assistant
+
+@st.cache_resource
+def _get_encoder() -> tiktoken.Encoding:
+    """Load the cl100k_base tokenizer once per process."""
+    return tiktoken.get_encoding("cl100k_base")
+
+def get_token_count(messages: list) -> int:
+    """
+    Calculate total tokens used in conversation.
+    Only messages added since the last call are encoded; the running
+    total is kept in session state and returned as-is while
+    messages_version is unchanged.
+    Args:
+        messages (list): List of conversation messages
+    Returns:
+        int: Total token count
+    """
+    if st.session_state.get("_tok_ver") == st.session_state.messages_version:
+        return st.session_state.token_count
+
+    if len(messages) < st.session_state.tokens_counted_upto:
+        # History was replaced or cleared, start counting from scratch
+        st.session_state.token_count = 0
+        st.session_state.tokens_counted_upto = 0
+
+    texts = [msg["content"] for msg in messages[st.session_state.tokens_counted_upto:]]
+    if texts:
+        token_lists = _get_encoder().encode_batch(texts, num_threads=4)
+        st.session_state.token_count += sum(map(len, token_lists))
+    st.session_state.tokens_counted_upto = len(messages)
+    st.session_state._tok_ver = st.session_state.messages_version
+    return st.session_state.token_count
+
+def display_chat_controls() -> None:
+    """Display chat control options: save, clear, and token count."""
+    cols = st.columns([1, 1, 2])  # Simplified column layout
+    
+    with cols[0]:
+        # Save chat button
+        # Re-serialize only when the message list has changed
+        if st.session_state.get("json_ver") != st.session_state.messages_version:
+            st.session_state.json_cache = orjson.dumps(st.session_state.messages)
+            st.session_state.json_ver = st.session_state.messages_version
+        st.download_button(
+            label="💾 Save Chat",
+            data=st.session_state.json_cache,
+            file_name="chat_history.json",
+            mime="application/json",
+        )
+    
+    with cols[1]:
+        # Clear chat button
+        if st.button("🗑️ Clear Chat"):
+            st.session_state.messages = []
+            st.session_state.messages_version += 1
+            st.session_state.token_count = 0
+            st.session_state.tokens_counted_upto = 0
+            st.session_state.thread_id = None
+            st.query_params.pop("tid", None)
+            st.rerun()
+    
+    with cols[2]:
+        # Token counter
+        token_count = get_token_count(st.session_state.messages)
+        st.link_button(
+            f"🔤 {token_count} tokens", 
+            "https://platform.openai.com/tokenizer"
+        )
+
+def _render_messages_markdown(messages: list) -> str:
+    """
+    Build a list of messages as one Markdown string.
+    Args:
+        messages (list): Messages in chronological order
+    Returns:
+        str: Markdown for the given messages
+    """
+    return "\n\n---\n\n".join(
+        f"{_AVATARS[msg['role']]} **{msg['role'].capitalize()}**\n\n{msg['content']}"
+        for msg in messages
+    )
+
+def display_chat_interface() -> None:
+    """Display the main chat interface with message history."""
+    chat_container = st.container()
+    with chat_container:
+        # Display message history as a single Markdown block, rebuilt only
+        # when the message list has changed
+        if st.session_state.messages:
+            if st.session_state.get("history_md_ver") != st.session_state.messages_version:
+                st.session_state.history_md = _render_messages_markdown(st.session_state.messages)
+                st.session_state.history_md_ver = st.session_state.messages_version
+            st.markdown(st.session_state.history_md)
+
+def display_new_messages(container, new_messages: list) -> None:
+    """
+    Render messages added during this run into an existing container,
+    so the full history does not need a rerun to show them.
+    Args:
+        container: Streamlit container placed after the chat history
+        new_messages (list): Messages just appended to the session history
+    """
+    markdown = _render_messages_markdown(new_messages)
+    if len(st.session_state.messages) > len(new_messages):
+        # Separate from the history rendered above
+        markdown = "---\n\n" + markdown
+    with container:
+        st.markdown(markdown)
+
+def handle_assistant_error(thread_id, user_message):
+    """
+    Handle errors when communicating with the assistant.
+    Provides fallback behavior when the assistant fails to respond.
+    
+    Args:
+        thread_id (str): The current thread ID
+        user_message (str): The user's message that caused the error
+        
+    Returns:
+        list: Updated messages list with error notification
+    """
+    # Log the error
+    logger.error(f"Assistant failed to process message: {user_message}")
+    
+    # Add user message to the conversation
+    st.session_state.messages.append({"role": "user", "content": user_message})
+    
+    # Add error message from assistant
+    error_message = {
+        "role": "assistant", 
+        "content": "I'm sorry, I encountered an error while processing your request. This might happen when retrieving information from my knowledge base. Could you try rephrasing your question or asking something else?"
+    }
+    st.session_state.messages.append(error_message)
+    st.session_state.messages_version += 1
+    
+    return st.session_state.messages
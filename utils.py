@@ -1,5 +1,8 @@
 import os
-from openai import OpenAI
+import json
+import sqlite3
+import threading
+from openai import APITimeoutError, OpenAI
 from typing import Dict, List
 import streamlit as st
 import time
@@ -8,41 +11,107 @@ from dotenv import load_dotenv
 # Load environment variables from .env file
 load_dotenv()
 
+@st.cache_resource
+def _get_openai_client(api_key: str) -> OpenAI:
+    """Create a single OpenAI client per API key, shared across reruns and sessions."""
+    return OpenAI(api_key=api_key)
+
 def init_openai_client() -> OpenAI:
     """Initialize OpenAI client with API key from environment variables."""
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         st.error("OpenAI API key not found. Please check your .env file.")
         st.stop()
-    return OpenAI(api_key=api_key)
+    return _get_openai_client(api_key)
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _retrieve_assistant(api_key: str, assistant_id_value: str) -> dict:
+    """
+    Fetch assistant metadata from OpenAI, cached per assistant ID.
+    Exceptions are not cached, so failed lookups are retried on the next rerun.
+    """
+    client = _get_openai_client(api_key)
+    assistant = client.beta.assistants.retrieve(assistant_id_value)
+    return {
+        'name': assistant.name,
+        'model': assistant.model,
+        'tools': [tool.type for tool in assistant.tools]
+    }
 
 def get_assistant_details(assistant_id: str = "ASSISTANT_ID") -> dict:
     """
-    Get assistant details from OpenAI.
+    Get assistant details.
+    Uses static metadata from <assistant_id>_NAME, <assistant_id>_MODEL and
+    <assistant_id>_TOOLS (a JSON list) when name and model are configured,
+    unless FORCE_LIVE_ASSISTANT=1. Otherwise the details are fetched from OpenAI.
     Args:
         assistant_id (str): The ID of the assistant to use
     Returns:
         dict: Assistant details
     """
     try:
-        client = init_openai_client()
         assistant_id_value = os.getenv(assistant_id)
         
         if not assistant_id_value:
             st.error(f"Assistant ID not found for {assistant_id}. Please check your .env file.")
             st.write(f"Available environment variables: {os.environ.keys()}")  # Debug line
             return None
+
+        name = os.getenv(f"{assistant_id}_NAME")
+        model = os.getenv(f"{assistant_id}_MODEL")
+        if name and model and os.getenv("FORCE_LIVE_ASSISTANT") != "1":
+            return {
+                'name': name,
+                'model': model,
+                'tools': json.loads(os.getenv(f"{assistant_id}_TOOLS", "[]"))
+            }
             
-        assistant = client.beta.assistants.retrieve(assistant_id_value)
-        return {
-            'name': assistant.name,
-            'model': assistant.model,
-            'tools': [tool.type for tool in assistant.tools]
-        }
+        # Resolve the client outside the cached helper so the missing-key
+        # error path is never memoized
+        client = init_openai_client()
+        return _retrieve_assistant(client.api_key, assistant_id_value)
     except Exception as e:
         st.error(f"Error getting assistant details: {e}")
         return None
 
+@st.cache_resource
+def _get_db() -> tuple:
+    """
+    Open the chat history database once per process.
+    Returns the connection together with a lock guarding it, since the
+    connection is shared by all sessions.
+    """
+    db = sqlite3.connect(os.getenv("CHAT_DB_PATH", "chat.db"), check_same_thread=False)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute(
+        "CREATE TABLE IF NOT EXISTS messages ("
+        "id INTEGER PRIMARY KEY, thread_id TEXT NOT NULL, ts REAL NOT NULL, "
+        "role TEXT NOT NULL, content TEXT NOT NULL)"
+    )
+    db.execute("CREATE INDEX IF NOT EXISTS idx_messages_thread ON messages (thread_id)")
+    db.commit()
+    return db, threading.Lock()
+
+def save_messages(thread_id: str, messages: List[Dict]) -> None:
+    """Append messages for a thread to the chat history database."""
+    db, lock = _get_db()
+    ts = time.time()
+    with lock, db:
+        db.executemany(
+            "INSERT INTO messages (thread_id, ts, role, content) VALUES (?, ?, ?, ?)",
+            [(thread_id, ts, msg["role"], msg["content"]) for msg in messages]
+        )
+
+def load_messages(thread_id: str) -> List[Dict]:
+    """Load the stored messages for a thread in chronological order."""
+    db, lock = _get_db()
+    with lock:
+        rows = db.execute(
+            "SELECT role, content FROM messages WHERE thread_id = ? ORDER BY ts, id",
+            (thread_id,)
+        ).fetchall()
+    return [{"role": role, "content": content} for role, content in rows]
+
 def create_thread() -> str:
     """Create a new thread for the conversation."""
     try:
@@ -53,62 +122,105 @@ def create_thread() -> str:
         st.error(f"Error creating thread: {str(e)}")
         return ""
 
-def send_message(thread_id: str, user_message: str) -> List[Dict]:
-    """Send a message to the assistant and get the response."""
-    try:
-        client = init_openai_client()
+def wait_for_run(client: OpenAI, thread_id: str, run, timeout: float = 30):
+    """
+    Poll a run until it leaves the queued/in_progress states.
+    Uses exponential backoff starting at 50ms so short runs return quickly
+    while long runs are polled at most once per second.
+    Returns None if the run times out.
+    """
+    start_time = time.time()
+    delay = 0.05
 
-        # Add the user message to the thread
-        client.beta.threads.messages.create(
-            thread_id=thread_id,
-            role="user",
-            content=user_message
-        )
+    while run.status in ["queued", "in_progress"]:
+        if time.time() - start_time > timeout:
+            st.error("Request timed out. Please try again.")
+            return None
 
-        # Run the assistant using the selected assistant ID from session state
-        run = client.beta.threads.runs.create(
+        time.sleep(delay)
+        delay = min(delay * 1.5, 1.0)
+        run = client.beta.threads.runs.retrieve(
             thread_id=thread_id,
-            assistant_id=os.getenv(st.session_state.selected_assistant)
+            run_id=run.id
         )
 
-        # Wait for the run to complete with timeout
-        start_time = time.time()
-        timeout = 30  # 30 seconds timeout
+    return run
 
-        while True:
-            if time.time() - start_time > timeout:
-                st.error("Request timed out. Please try again.")
-                return []
+def send_message(thread_id: str, user_message: str) -> List[Dict]:
+    """
+    Send a message to the assistant and get the response.
+    Returns only the messages added by this turn (the user message followed
+    by the assistant replies), in chronological order.
+    """
+    try:
+        client = init_openai_client()
 
-            run = client.beta.threads.runs.retrieve(
+        # Run the assistant using the selected assistant ID from session state.
+        # The user message is attached to the run request itself, saving the
+        # separate messages.create round-trip.
+        assistant_id = os.getenv(st.session_state.selected_assistant)
+        additional_messages = [{"role": "user", "content": user_message}]
+        if os.getenv("ASSISTANT_STREAMING", "1") == "0":
+            run = client.beta.threads.runs.create(
                 thread_id=thread_id,
-                run_id=run.id
+                assistant_id=assistant_id,
+                additional_messages=additional_messages
             )
-
-            if run.status == "completed":
-                break
-            elif run.status in ["failed", "cancelled", "expired"]:
-                st.error(f"Run failed with status: {run.status}")
+            run = wait_for_run(client, thread_id, run)
+            if run is None:
                 return []
-            elif run.status in ["queued", "in_progress"]:
-                time.sleep(0.5)
-            else:
-                st.error(f"Unexpected run status: {run.status}")
+
+            # Get only the messages produced by this run
+            messages = client.beta.threads.messages.list(
+                thread_id=thread_id,
+                run_id=run.id,
+                order="asc"
+            ).data
+        else:
+            # Stream run events over a single connection instead of polling;
+            # completed messages are collected from the stream itself
+            timeout = 30  # 30 seconds timeout for the whole run
+            deadline = time.time() + timeout
+            timed_out = False
+            with client.beta.threads.runs.stream(
+                thread_id=thread_id,
+                assistant_id=assistant_id,
+                additional_messages=additional_messages,
+                timeout=timeout  # Max wait between streamed events
+            ) as stream:
+                for _ in stream:
+                    if time.time() > deadline:
+                        timed_out = True
+                        break
+                run = stream.current_run
+                if not timed_out:
+                    messages = stream.get_final_messages()
+
+            if timed_out:
+                if run is not None:
+                    try:
+                        client.beta.threads.runs.cancel(thread_id=thread_id, run_id=run.id)
+                    except Exception:
+                        pass  # The run may have finished in the meantime
+                st.error("Request timed out. Please try again.")
                 return []
 
-        # Get all messages from the thread
-        messages = client.beta.threads.messages.list(thread_id=thread_id)
+        if run.status != "completed":
+            st.error(f"Run failed with status: {run.status}")
+            return []
 
         # Convert messages to a list of dictionaries
-        message_list = []
-        for msg in messages:
-            message_list.append({
-                "role": msg.role,
-                "content": msg.content[0].text.value if msg.content else ""
-            })
+        message_list = [{"role": "user", "content": user_message}] + [
+            {"role": msg.role, "content": msg.content[0].text.value if msg.content else ""}
+            for msg in messages
+            if msg.role == "assistant"
+        ]
 
         return message_list
 
+    except APITimeoutError:
+        st.error("Request timed out. Please try again.")
+        return []
     except Exception as e:
         st.error(f"Error in chat interaction: {str(e)}")
         return []
\ No newline at end of file